@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
+from devices.busitem import refresh_items
 from devices.multiplus import MultiPlusInverter, MultiPlusACType
 from devices.phoenix import PhoenixInverter, PhoenixState
 from devices.system import VeSystem
 from devices.van import VanOBD
-import time
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+from lib.ve_utils import add_name_owner_changed_receiver
+import dbus
+from typing import Optional
 
 # TTYs for various devices
 MULTIPLUS_TTY = "/dev/ttyS4"
@@ -17,25 +22,100 @@ CURR_LIMIT_LOW = 7.8
 CURR_LIMIT_HIGH = 13.0
 POLL_INTERVAL_SEC = 1
 
+STATUS_FMT = "[ac: %s rpm: %s] [state: %s curr: %s volt: %s] [limit: %s type: %s] [soc: %s]"
 
-def main():
-    multiplus = MultiPlusInverter(MULTIPLUS_TTY)
-    phoenix = PhoenixInverter(PHOENIX_TTY)
-    van = VanOBD(VAN_TTY)
-    ve_system = VeSystem()
 
-    print("[watcher] started; monitoring system...")
+class CurrentLimitWatcher:
+    _error: Optional[Exception] = None
+    _last_status: tuple = ()
+    _seeded: bool = False
+
+    def __init__(self, mainloop: GLib.MainLoop):
+        self._mainloop = mainloop
+
+        # Van RPM, A/C and battery SoC trigger a reevaluation as soon as they change on the bus
+        self.multiplus = MultiPlusInverter(MULTIPLUS_TTY)
+        self.phoenix = PhoenixInverter(PHOENIX_TTY)
+        self.van = VanOBD(VAN_TTY, on_change=self._on_change)
+        self.ve_system = VeSystem(on_change=self._on_change)
+
+        # Cached values are only updated by signals, so follow the services coming and going too
+        self._bus_items = self.multiplus.bus_items + self.van.bus_items + self.ve_system.bus_items
+        add_name_owner_changed_receiver(dbus.SystemBus(), self._on_name_owner_changed)
 
-    while True:
-        phoenix.read_telemetry_frame()
+        # Seed every cached value with one concurrent batch of reads
+        refresh_items(self._bus_items)
+        self._seeded = True
 
-        print(
-            f"[ac: {van.air_conditioner_on} rpm: {van.rpm}] "
-            + f"[state: {phoenix.state.name} curr: {phoenix.ac_current} volt: {phoenix.dc_voltage}] "
-            + f"[limit: {multiplus.ac1_current_limit} type: {multiplus.ac1_type.name}] "
-            + f"[soc: {ve_system.dc_soc}]"
+    def _on_change(self, service_name, path, changes):
+        # Signals can already arrive while the initial values are being read
+        if self._seeded:
+            self._run(lambda: self.reevaluate(switch_phoenix=False))
+
+    def _on_name_owner_changed(self, name, old_owner, new_owner):
+        items = [item for item in self._bus_items if item.serviceName == name]
+
+        if len(items) == 0:
+            return
+
+        if new_owner == "":
+            # The cache would keep the last values forever, so exit and let the supervisor restart
+            # us, just like a failing GetValue would have
+            self._run(lambda: self._service_lost(name))
+        else:
+            # A (re)started service does not re-announce its values, so read them once. This waits
+            # for replies, so do it from an idle callback rather than inside this signal handler
+            GLib.idle_add(self._refresh, items)
+
+    @staticmethod
+    def _service_lost(name):
+        raise IOError(f"{name} left the bus")
+
+    def _refresh(self, items) -> bool:
+        self._run(lambda: refresh_items(items))
+
+        return False
+
+    def _run(self, func) -> bool:
+        # An exception would otherwise silently remove the tick's timeout source, or hit the
+        # os._exit() in VeDbusItemImport's signal handler. Instead, stop the main loop and let main()
+        # re-raise it, so the process exits and gets restarted either way
+        try:
+            func()
+        except Exception as exc:
+            self._error = exc
+            self._mainloop.quit()
+
+            return False
+
+        return True
+
+    def reevaluate(self, switch_phoenix: bool = True):
+        # Phoenix telemetry is only fresh right after a tick has read it, so only ticks may turn the
+        # Phoenix on or off. Otherwise every signal would act on the same stale state and resend
+        # the same command
+        multiplus = self.multiplus
+        phoenix = self.phoenix
+        van = self.van
+        ve_system = self.ve_system
+
+        status = (
+            van.air_conditioner_on,
+            van.rpm,
+            phoenix.state,
+            phoenix.ac_current,
+            phoenix.dc_voltage,
+            multiplus.ac1_current_limit,
+            multiplus.ac1_type,
+            ve_system.dc_soc,
         )
 
+        # Only log when something changed, otherwise the same line is repeated every tick
+        if status != self._last_status:
+            self._last_status = status
+            ac_on, rpm, state, curr, volt, limit, ac_type, soc = status
+            print(STATUS_FMT % (ac_on, rpm, state.name, curr, volt, limit, ac_type.name, soc))
+
         if (van.rpm > 0 and not van.air_conditioner_on) or ve_system.dc_soc < 5:
             if phoenix.ac_current > 0:
                 if multiplus.ac1_current_limit > CURR_LIMIT_LOW:
@@ -50,10 +130,10 @@ def main():
                 if multiplus.ac1_type != MultiPlusACType.SHORE:
                     multiplus.ac1_type = MultiPlusACType.SHORE
 
-            if phoenix.state != PhoenixState.INVERTING:
+            if switch_phoenix and phoenix.state != PhoenixState.INVERTING:
                 phoenix.on()
         else:
-            if phoenix.state == PhoenixState.INVERTING:
+            if switch_phoenix and phoenix.state == PhoenixState.INVERTING:
                 phoenix.off()
 
                 if multiplus.ac1_current_limit == CURR_LIMIT_LOW:
@@ -61,7 +141,31 @@ def main():
 
                 multiplus.ac1_type = MultiPlusACType.SHORE
 
-        time.sleep(POLL_INTERVAL_SEC)
+    def _tick(self):
+        # Phoenix values come from serial telemetry, which is not signalled, so poll it here
+        self.phoenix.read_telemetry_frame()
+        self.reevaluate()
+
+    def tick(self) -> bool:
+        return self._run(self._tick)
+
+    def raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+
+def main():
+    DBusGMainLoop(set_as_default=True)
+
+    mainloop = GLib.MainLoop()
+    watcher = CurrentLimitWatcher(mainloop)
+
+    print("[watcher] started; monitoring system...")
+
+    GLib.timeout_add(POLL_INTERVAL_SEC * 1000, watcher.tick)
+    mainloop.run()
+
+    watcher.raise_error()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+from gi.repository import GLib
+
+from lib.ve_utils import unwrap_dbus_value, wrap_dbus_value
+
+BUSITEM_INTERFACE = "com.victronenergy.BusItem"
+
+
+def item_setter(item):
+    """Return a function that writes new values to a VeDbusItemImport.
+
+    The SetValue method is resolved once rather than on every write, and the cached value is
+    updated locally instead of being read back from the bus like VeDbusItemImport.set_value does.
+    """
+    set_value = item._proxy.get_dbus_method("SetValue", BUSITEM_INTERFACE)
+
+    def setter(value):
+        r = set_value(wrap_dbus_value(value))
+
+        if r == 0:
+            item._cachedvalue = value
+
+        return r
+
+    return setter
+
+
+def refresh_items(items, timeout: float = 1.0) -> None:
+    """Re-read the cached values of several VeDbusItemImport objects at once.
+
+    All GetValue calls are sent before any reply is awaited, so the total wait is that of the
+    slowest reply rather than the sum of all of them. Replies are dispatched by iterating the
+    default GLib main context, so this must be called from the thread that runs the main loop.
+    Items that don't answer within timeout seconds keep their current value.
+    """
+    pending = [0]
+
+    def _reply_handler(item):
+        def handler(value):
+            item._cachedvalue = unwrap_dbus_value(value)
+            pending[0] -= 1
+
+        return handler
+
+    def _error_handler(item):
+        def handler(exc):
+            print(f"[dbus] failed reading {item.serviceName}{item.path}: {exc}")
+            pending[0] -= 1
+
+        return handler
+
+    for item in items:
+        item._proxy.GetValue(
+            reply_handler=_reply_handler(item),
+            error_handler=_error_handler(item),
+            timeout=timeout,
+        )
+        pending[0] += 1
+
+    # Every call ends in either a reply or an error, at the latest once its timeout expires
+    context = GLib.MainContext.default()
+
+    while pending[0] > 0:
+        context.iteration(True)
@@ -1,6 +1,9 @@
 import dbus
 from enum import Enum
 
+from devices.busitem import item_setter
+from lib.vedbus import VeDbusItemImport
+
 
 class MultiPlusState(Enum):
     OFF = 0
@@ -26,41 +29,61 @@ class MultiPlusACType(Enum):
 
 
 class MultiPlusInverter:
-    DBUS_OBJ_TYPE = "com.victronenergy.BusItem"
     DBUS_SERVICE_PREFIX = "com.victronenergy.vebus."
     DBUS_AC_CURR_LIMIT = "/Ac/In/1/CurrentLimit"
     DBUS_PATH_STATE = "/State"
     DBUS_PATH_AC1_TYPE = "/Settings/SystemSetup/AcInput1"
 
-    def __init__(self, tty):
+    def __init__(self, tty, on_change=None):
         self._bus = dbus.SystemBus()
+        self._on_change = on_change
         self._tty = tty.removeprefix("/dev/")
-        self._ac_type_iface = self._get_iface(self.DBUS_PATH_AC1_TYPE)
-        self._ac_curr_limit_iface = self._get_iface(self.DBUS_AC_CURR_LIMIT)
-        self._state_iface = self._get_iface(self.DBUS_PATH_STATE)
+        self._ac_type_item = self._get_item(self.DBUS_PATH_AC1_TYPE)
+        self._ac_curr_limit_item = self._get_item(self.DBUS_AC_CURR_LIMIT)
+        self._state_item = self._get_item(self.DBUS_PATH_STATE)
+        self._set_ac_type = item_setter(self._ac_type_item)
+        self._set_ac_curr_limit = item_setter(self._ac_curr_limit_item)
+
+    def _get_item(self, path):
+        # Values are cached locally and kept up to date by PropertiesChanged signals, so reads
+        # do not go over the bus. Seed them with refresh_items(self.bus_items)
+        return VeDbusItemImport(
+            self._bus,
+            f"{self.DBUS_SERVICE_PREFIX}{self._tty}",
+            path,
+            self._on_change,
+            initialValue=None,
+        )
 
-    def _get_iface(self, path):
-        obj = self._bus.get_object(f"{self.DBUS_SERVICE_PREFIX}{self._tty}", path)
-        return dbus.Interface(obj, self.DBUS_OBJ_TYPE)
+    @property
+    def bus_items(self) -> list[VeDbusItemImport]:
+        return [self._ac_type_item, self._ac_curr_limit_item, self._state_item]
 
     @property
     def state(self) -> MultiPlusState:
-        return MultiPlusState(round(self._state_iface.GetValue()))
+        return MultiPlusState(round(self._state_item.get_value()))
 
     @property
     def ac1_type(self) -> MultiPlusACType:
-        return MultiPlusACType(self._ac_type_iface.GetValue())
+        return MultiPlusACType(self._ac_type_item.get_value())
 
     @ac1_type.setter
     def ac1_type(self, value: MultiPlusACType):
+        # The cache follows every change on the bus, so a matching value means there is no work
+        if self._ac_type_item.get_value() == value.value:
+            return
+
         print(f"[multiplus] setting ac1 type to {value.name}")
-        self._ac_type_iface.SetValue(value.value)
+        self._set_ac_type(value.value)
 
     @property
     def ac1_current_limit(self) -> float:
-        return round(self._ac_curr_limit_iface.GetValue(), 2)
+        return round(self._ac_curr_limit_item.get_value(), 2)
 
     @ac1_current_limit.setter
     def ac1_current_limit(self, value: float):
+        if self._ac_curr_limit_item.get_value() == value:
+            return
+
         print(f"[multiplus] setting current limit to {value}")
-        self._ac_curr_limit_iface.SetValue(value)
+        self._set_ac_curr_limit(value)
@@ -1,8 +1,11 @@
+import binascii
+import os
+import selectors
 import struct
 import time
 from dataclasses import dataclass
 from enum import Enum
-import math
+from functools import lru_cache
 from typing import Optional
 
 import serial
@@ -51,21 +54,28 @@ class VEDirectRequest:
 
     @staticmethod
     def _checksum(p0: bytes) -> bytes:
-        return ((85 - sum(p0)) & 0xFF).to_bytes(1, byteorder="little")
+        return bytes(((85 - sum(p0)) & 0xFF,))
 
     @staticmethod
     def _int_to_min_bytes(i: int) -> bytes:
-        return i.to_bytes(math.ceil(i.bit_length() / 8), byteorder="little")
+        return i.to_bytes((i.bit_length() + 7) // 8, byteorder="little")
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _header(cmd: VEDirectCommand, register: str, flag: VEDirectFlag) -> bytes:
+        # Only a handful of cmd/register/flag combinations are ever used, so pack each one once
+        return struct.pack("<BHB", cmd.value, int(register, 16), flag.value)
 
     def to_bytes(self) -> bytes:
-        register_bytes = int(self.register, 16).to_bytes(2, byteorder="little")
-        value_bytes = self._int_to_min_bytes(self.value) if self.value is not None else b""
-        request_bytes = self.cmd.to_bytes() + register_bytes + self.flag.to_bytes() + value_bytes
-        checksum = self._checksum(request_bytes)
-        return request_bytes + checksum
+        request_bytes = self._header(self.cmd, self.register, self.flag)
+
+        if self.value is not None:
+            request_bytes += self._int_to_min_bytes(self.value)
+
+        return request_bytes + self._checksum(request_bytes)
 
     def to_hex(self) -> bytes:
-        return self.to_bytes().hex()[1:].upper().encode()
+        return binascii.hexlify(self.to_bytes())[1:].upper()
 
 
 @dataclass
@@ -75,40 +85,40 @@ class VEDirectResponse:
     flag: VEDirectFlag
     value: Optional[int] = None
 
+    # Lookup tables for decoding, indexing a dict is cheaper than calling the Enum
+    _COMMANDS = {c.value: c for c in VEDirectCommand}
+    _FLAGS = {f.value: f for f in VEDirectFlag}
+    _VALUE_STRUCTS = {
+        1: struct.Struct("B"),
+        2: struct.Struct("<H"),
+        4: struct.Struct("<L"),
+        8: struct.Struct("<Q"),
+    }
+    _REGISTER_STRUCT = struct.Struct("<H")
+
     @staticmethod
     def _checksum(p0: bytes) -> bool:
         return (85 - sum(p0)) & 0xFF == 0
 
     @classmethod
     def from_bytes(cls, p0: bytes):
-        cmd = p0[0]
-        register = struct.unpack("<H", p0[1:3])[0]
-        flag = p0[3]
-        value = p0[4:-1]
-
-        if len(value) == 1:
-            fmt = "B"
-        elif len(value) == 2:
-            fmt = "<H"
-        elif len(value) == 4:
-            fmt = "<L"
-        elif len(value) == 8:
-            fmt = "<Q"
-        else:
-            fmt = None
-
-        if fmt is not None:
-            value = struct.unpack(fmt, p0[4:-1])[0]
-        else:
-            value = None
-
         if not cls._checksum(p0):
             raise ValueError(f"Checksum failed generating VEDirectResponse({p0})")
 
+        register = cls._REGISTER_STRUCT.unpack_from(p0, 1)[0]
+        value_struct = cls._VALUE_STRUCTS.get(len(p0) - 5)
+        value = value_struct.unpack_from(p0, 4)[0] if value_struct is not None else None
+
+        try:
+            cmd = cls._COMMANDS[p0[0]]
+            flag = cls._FLAGS[p0[3]]
+        except KeyError as exc:
+            raise ValueError(f"Unknown command or flag in VEDirectResponse({p0})") from exc
+
         return cls(
-            cmd=VEDirectCommand(cmd),
+            cmd=cmd,
             register=f"0x{register:04X}",
-            flag=VEDirectFlag(flag),
+            flag=flag,
             value=value,
         )
 
@@ -129,6 +139,22 @@ class VEDirectResponse:
 class PhoenixInverter:
     BAUD = 19200
 
+    # Mode register writes never change, so build them once
+    REQ_ON = VEDirectRequest(
+        cmd=VEDirectCommand.SET,
+        register="0x0200",
+        flag=VEDirectFlag.OK,
+        value=2,
+    )
+    REQ_OFF = VEDirectRequest(
+        cmd=VEDirectCommand.SET,
+        register="0x0200",
+        flag=VEDirectFlag.OK,
+        value=4,
+    )
+
+    _rx_buf: Optional[bytearray] = None
+    _selector: Optional[selectors.BaseSelector] = None
     _serial: Optional[serial.Serial] = None
     _telemetry: dict = {}
     _tty: str = None
@@ -137,14 +163,11 @@ class PhoenixInverter:
         self._tty = tty.removeprefix("/dev/")
         self.connect()
 
-    @staticmethod
-    def _checksum(p0: bytes) -> bool:
-        return sum(p0) % 256 == 0
-
     def execute(self, request: VEDirectRequest) -> VEDirectResponse:
         # Clear out the buffers
         self._serial.reset_input_buffer()
         self._serial.reset_output_buffer()
+        self._rx_buf.clear()
 
         # Send the command
         self._serial.write(b":" + request.to_hex() + b"\n")
@@ -153,8 +176,9 @@ class PhoenixInverter:
         _ = self._serial.read_until(b":")
 
         # The response is between :{response}\n
+        # The leading zero nibble of the command byte is not sent, add it back before decoding
         resp = self._serial.read_until(b"\n").strip()
-        resp_bytes = bytes.fromhex(f"0{resp.decode()}")
+        resp_bytes = binascii.a2b_hex(b"0" + resp)
 
         return VEDirectResponse.from_bytes(resp_bytes)
 
@@ -163,42 +187,87 @@ class PhoenixInverter:
             self._serial = serial.Serial(
                 f"/dev/{self._tty}", baudrate=self.BAUD, timeout=0.25, write_timeout=0.5
             )
+            self._rx_buf = bytearray()
         except SerialException as exc:
             self._serial = None
 
             raise exc
 
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._serial.fd, selectors.EVENT_READ)
+
+        # Don't let the driver hold back received bytes (up to 16ms on USB-serial adapters)
+        try:
+            self._serial.set_low_latency_mode(True)
+        except ValueError as exc:
+            print(f"[phoenix] could not enable low latency mode: {exc}")
+
     def disconnect(self) -> None:
+        if self._selector is not None:
+            self._selector.close()
+
         if self._serial is not None:
             self._serial.close()
 
+        self._selector = None
         self._serial = None
 
+    def _read_available(self) -> bytes:
+        # Only called once select() reported the fd readable, so no data means it was hung up
+        data = os.read(self._serial.fd, 4096)
+
+        if not data:
+            raise SerialException("device reports readiness to read but returned no data")
+
+        return data
+
+    def _read_lines(self):
+        # Wait for the port to become readable, then drain everything the driver has buffered with
+        # one read instead of one read per line. Any partial line is kept for the next call
+        while True:
+            # Fields are preceded rather than followed by \r\n, so the Checksum field that ends a
+            # block is not terminated until the next block starts. Take it as soon as its single
+            # byte is in, and add back the \r\n it is missing so the running sum still works out
+            if self._rx_buf.startswith(b"Checksum\t") and len(self._rx_buf) >= 10:
+                line = bytes(self._rx_buf[:10]) + b"\r\n"
+                del self._rx_buf[:10]
+                yield line
+                continue
+
+            eol = self._rx_buf.find(b"\r\n")
+
+            if eol == -1:
+                if self._selector.select(timeout=1.0):
+                    self._rx_buf += self._read_available()
+
+                continue
+
+            line = bytes(self._rx_buf[: eol + 2])
+            del self._rx_buf[: eol + 2]
+            yield line
+
     def read_telemetry_frame(self):
         self._serial.reset_output_buffer()
 
-        raw = b""
+        checksum = 0
         telemetry = {}
 
-        while True:
-            raw_line = self._serial.read_until(b"\r\n")
-            line = raw_line.strip().decode("ascii", "ignore")
+        for raw_line in self._read_lines():
+            tab = raw_line.find(b"\t")
 
-            if line == "" or not "\t" in line:
+            if tab == -1:
                 continue
 
-            key, value = line.split("\t")
-            telemetry[key] = value
-            raw += raw_line
+            # Values are kept as bytes, int() and float() parse them without decoding
+            key = raw_line[:tab].decode("ascii", "ignore")
+            telemetry[key] = raw_line[tab + 1 : -2]
+            checksum = (checksum + sum(raw_line)) & 0xFF
 
             if key == "Checksum":
-                if not raw.endswith(b"\r\n"):
-                    raw += b"\r\n"
-
-                if len(telemetry) == 12 and self._checksum(raw):
+                if len(telemetry) == 12 and checksum == 0:
                     break
                 else:
-                    raw = b""
+                    checksum = 0
                     telemetry = {}
 
         self._telemetry = telemetry
@@ -302,26 +371,14 @@ class PhoenixInverter:
     def on(self):
         print(f"[phoenix] turning on")
 
-        req = VEDirectRequest(
-            cmd=VEDirectCommand.SET,
-            register="0x0200",
-            flag=VEDirectFlag.OK,
-            value=2,
-        )
-        resp = self.execute(req)
-        resp.check(req)
+        resp = self.execute(self.REQ_ON)
+        resp.check(self.REQ_ON)
 
     def off(self):
         print(f"[phoenix] turning off")
 
-        req = VEDirectRequest(
-            cmd=VEDirectCommand.SET,
-            register="0x0200",
-            flag=VEDirectFlag.OK,
-            value=4,
-        )
-        resp = self.execute(req)
-        resp.check(req)
+        resp = self.execute(self.REQ_OFF)
+        resp.check(self.REQ_OFF)
 
 
 if __name__ == "__main__":
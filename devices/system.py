@@ -1,19 +1,26 @@
 import dbus
 
+from lib.vedbus import VeDbusItemImport
+
 
 class VeSystem:
-    DBUS_OBJ_TYPE = "com.victronenergy.BusItem"
     DBUS_SERVICE = "com.victronenergy.system"
     DBUS_PATH_DC_SOC = "/Dc/Battery/Soc"
 
-    def __init__(self):
+    def __init__(self, on_change=None):
         self._bus = dbus.SystemBus()
-        self._dc_soc_iface = self._get_iface(self.DBUS_PATH_DC_SOC)
+        self._on_change = on_change
+        self._dc_soc_item = self._get_item(self.DBUS_PATH_DC_SOC)
+
+    def _get_item(self, path):
+        return VeDbusItemImport(
+            self._bus, self.DBUS_SERVICE, path, self._on_change, initialValue=None
+        )
 
-    def _get_iface(self, path):
-        obj = self._bus.get_object(self.DBUS_SERVICE, path)
-        return dbus.Interface(obj, self.DBUS_OBJ_TYPE)
+    @property
+    def bus_items(self) -> list[VeDbusItemImport]:
+        return [self._dc_soc_item]
 
     @property
     def dc_soc(self):
-        return round(self._dc_soc_iface.GetValue(), 2)
+        return round(self._dc_soc_item.get_value(), 2)
@@ -1,34 +1,47 @@
 import dbus
 
+from lib.vedbus import VeDbusItemImport
+
 
 class VanOBD:
-    DBUS_OBJ_TYPE = "com.victronenergy.BusItem"
     DBUS_SERVICE_PREFIX = "com.victronenergy.obd."
     DBUS_PATH_AC_ON = "/Van0/AirConditionerOn"
     DBUS_PATH_ALT_CURR = "/Van0/AlternatorCurrent"
     DBUS_PATH_RPM = "/Van0/RPM"
 
-    def __init__(self, tty):
+    def __init__(self, tty, on_change=None):
         self._bus = dbus.SystemBus()
+        self._on_change = on_change
         self._tty = tty.removeprefix("/dev/")
-        self._ac_on_iface = self._get_iface(self.DBUS_PATH_AC_ON)
-        self._alt_curr_iface = self._get_iface(self.DBUS_PATH_ALT_CURR)
-        self._rpm_iface = self._get_iface(self.DBUS_PATH_RPM)
+        self._ac_on_item = self._get_item(self.DBUS_PATH_AC_ON, self._on_change)
+        self._alt_curr_item = self._get_item(self.DBUS_PATH_ALT_CURR)
+        self._rpm_item = self._get_item(self.DBUS_PATH_RPM, self._on_change)
 
-    def _get_iface(self, path):
+    def _get_item(self, path, on_change=None):
         # TODO(roo): Make this work with multiple different TTYs
-        # obj = self._bus.get_object(f"{self.DBUS_SERVICE_PREFIX}{self._tty}", path)
-        obj = self._bus.get_object(self.DBUS_SERVICE_PREFIX.removesuffix("."), path)
-        return dbus.Interface(obj, self.DBUS_OBJ_TYPE)
+        # return VeDbusItemImport(
+        #     self._bus, f"{self.DBUS_SERVICE_PREFIX}{self._tty}", path, on_change, initialValue=None
+        # )
+        return VeDbusItemImport(
+            self._bus,
+            self.DBUS_SERVICE_PREFIX.removesuffix("."),
+            path,
+            on_change,
+            initialValue=None,
+        )
+
+    @property
+    def bus_items(self) -> list[VeDbusItemImport]:
+        return [self._ac_on_item, self._alt_curr_item, self._rpm_item]
 
     @property
     def air_conditioner_on(self):
-        return bool(self._ac_on_iface.GetValue())
+        return bool(self._ac_on_item.get_value())
 
     @property
     def alternator_current(self):
-        return round(self._alt_curr_iface.GetValue(), 2)
+        return round(self._alt_curr_item.get_value(), 2)
 
     @property
     def rpm(self):
-        return round(self._rpm_iface.GetValue(), 2)
+        return round(self._rpm_item.get_value(), 2)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import os
+import selectors
 import time
 from typing import Optional
 
@@ -21,9 +22,19 @@ class VanOBDConnection:
         ("ATH0", False),
         ("ATSP0", False),
     ]
+    # Number of data bytes returned for each mode 01 PID we query
+    MODE01_PID_BYTES = {0x0C: 2, 0x2F: 1}
+    # Positive response headers ("62" + DID) for the mode 22 reads
+    RESP_ALT_CURR = b"\x62\x05\x51"
+    RESP_AC_ON = b"\x62\x09\x9b"
     POSSIBLE_PORTS = ["/dev/ttyUSB0", "/dev/ttyUSB1", "/dev/ttyUSB2"]
+    # Protocol search under ATSP0 and "NO DATA" waits take seconds, well past the port timeout
+    PROMPT_TIMEOUT = 5.0
 
     port: Optional[str] = None
+    _prompt_pending: bool = False
+    _rx_buf: Optional[bytearray] = None
+    _selector: Optional[selectors.BaseSelector] = None
     _serial: Optional[serial.Serial] = None
 
     @staticmethod
@@ -35,19 +46,34 @@ class VanOBDConnection:
         return resp.decode("ascii", "ignore")
 
     @staticmethod
-    def _split_hex(resp: str) -> list[str]:
-        return [resp[i : i + 2] for i in range(0, len(resp), 2)]
+    def _unhex(resp: str) -> bytes:
+        # Anything that is not a hex payload (e.g. "NO DATA") is treated as an empty response
+        try:
+            return bytes.fromhex(resp)
+        except ValueError:
+            return b""
 
     def connect(self, port: str) -> None:
         try:
             self._serial = serial.Serial(port, baudrate=self.BAUD, timeout=0.25, write_timeout=0.5)
             self.port = port
+            self._prompt_pending = False
+            self._rx_buf = bytearray()
         except SerialException as exc:
             self._serial = None
             self.port = None
 
             raise exc
 
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._serial.fd, selectors.EVENT_READ)
+
+        # Don't let the driver hold back received bytes (up to 16ms on USB-serial adapters)
+        try:
+            self._serial.set_low_latency_mode(True)
+        except ValueError as exc:
+            print(f"[obd] could not enable low latency mode: {exc}")
+
     def elm_init(self):
         self.reset()
 
@@ -67,42 +93,133 @@ class VanOBDConnection:
         print(f"[obd] banner: {banner}")
 
     def disconnect(self):
+        if self._selector is not None:
+            self._selector.close()
+
         if self._serial is not None:
             self._serial.close()
 
+        self._selector = None
         self._serial = None
         self.port = None
 
+    def _reset_buffers(self):
+        self._serial.reset_input_buffer()
+        self._serial.reset_output_buffer()
+        self._rx_buf.clear()
+
+    def _read_available(self) -> bytes:
+        # Only called once select() reported the fd readable, so no data means it was hung up
+        data = os.read(self._serial.fd, 4096)
+
+        if not data:
+            raise SerialException("device reports readiness to read but returned no data")
+
+        return data
+
+    def _read_until(self, terminator: bytes, timeout: Optional[float] = None) -> bytes:
+        # Like serial.Serial.read_until, but waits for the fd to become readable and then takes
+        # everything available in one read. Bytes past the terminator are kept for the next call
+        deadline = time.monotonic() + (self._serial.timeout if timeout is None else timeout)
+        end = self._rx_buf.find(terminator)
+
+        while end == -1:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0 or not self._selector.select(timeout=remaining):
+                end = len(self._rx_buf)
+                break
+
+            self._rx_buf += self._read_available()
+            end = self._rx_buf.find(terminator)
+        else:
+            end += len(terminator)
+
+        data = bytes(self._rx_buf[:end])
+        del self._rx_buf[:end]
+
+        return data
+
     def reset(self):
         if self._serial is None:
             raise IOError("can not call reset without first calling connect")
 
-        self._serial.reset_input_buffer()
-        self._serial.reset_output_buffer()
+        self._reset_buffers()
         self._serial.write(self._encode(f"ATZ\r"))
 
         time.sleep(2)
 
-        self._serial.reset_input_buffer()
-        self._serial.reset_output_buffer()
+        self._reset_buffers()
 
     def execute(self, cmd: str, echo: bool = False) -> str:
         if self._serial is None:
             raise IOError("can not call execute without first calling connect")
 
-        self._serial.reset_input_buffer()
-        self._serial.reset_output_buffer()
+        # Every response is read up to its prompt, so the buffers only need resetting when the
+        # previous command timed out. Its late reply is drained first so it can't be mistaken for
+        # the reply to this command, and the buffers keep being flushed until a prompt shows up
+        if self._prompt_pending:
+            if self._read_until(b">", self.PROMPT_TIMEOUT).endswith(b">"):
+                self._prompt_pending = False
+
+            self._reset_buffers()
+
         self._serial.write(self._encode(f"{cmd}\r"))
 
-        time.sleep(0.2)
+        # The ELM327 prints a ">" prompt once it is done, so there is no need to sleep
+        raw = self._read_until(b">", self.PROMPT_TIMEOUT)
+
+        if not raw.endswith(b">"):
+            self._prompt_pending = True
+
+        lines = [line.strip() for line in self._decode(raw).rstrip(">").split("\r")]
 
         if echo:
-            echoed_cmd = self._decode(self._serial.read_until(b"\r").rstrip())
+            echoed_cmd = lines.pop(0) if lines else ""
 
             if echoed_cmd != cmd:
+                self._reset_buffers()
                 raise IOError(f"expected echo, got: {echoed_cmd}")
 
-        return self._decode(self._serial.read_until(b"\r").rstrip())
+        # Only the first response is returned, like reading a single line did before. When several
+        # ECUs answer, or an AT command prints more than one line, the rest is ignored
+        lines = [line for line in lines if line != "" and not line.startswith("SEARCHING")]
+
+        if len(lines) == 0:
+            return ""
+
+        # A multi-frame response is its total byte count followed by frames prefixed with their
+        # sequence number ("0:", "1:", ...); those frames together make up the first response
+        if len(lines) > 1 and lines[1].startswith("0:"):
+            data = ""
+
+            for line in lines[1:]:
+                if line[1:2] != ":" or (data != "" and line.startswith("0:")):
+                    break
+
+                data += line[2:]
+
+            return data
+
+        return lines[0]
+
+    def query_mode01(self, *pids: int) -> dict[int, bytes]:
+        resp = self._unhex(self.execute("01" + "".join(f"{p:02X}" for p in pids)))
+
+        if len(resp) == 0 or resp[0] != 0x41:
+            return {}
+
+        # A multi-PID response is "41" followed by each PID and its data bytes
+        data = {}
+        i = 1
+
+        while i < len(resp) and resp[i] in self.MODE01_PID_BYTES:
+            pid = resp[i]
+            size = self.MODE01_PID_BYTES[pid]
+            data[pid] = resp[i + 1 : i + 1 + size]
+            i += 1 + size
+
+        return data
 
     def detect_adapter(self) -> None:
         print("[obd] scanning for adapter...")
@@ -127,44 +244,53 @@ class VanOBDConnection:
 
     @property
     def alternator_current(self) -> float:
-        resp = self._split_hex(self.execute("220551"))
+        resp = self._unhex(self.execute("220551"))
 
-        if len(resp) >= 5 and resp[0] == "62" and resp[1] == "05" and resp[2] == "51":
-            a = int(resp[3], 16)
-            b = int(resp[4], 16)
-            return (a * 256 + b) / 100.0
+        if len(resp) >= 5 and resp[:3] == self.RESP_ALT_CURR:
+            return (resp[3] * 256 + resp[4]) / 100.0
 
         return 0.0
 
     @property
     def air_conditioner_on(self) -> int:
-        resp = self._split_hex(self.execute("22099B"))
+        resp = self._unhex(self.execute("22099B"))
 
-        if len(resp) == 5 and resp[0] == "62" and resp[1] == "09" and resp[2] == "9B":
-            return int(resp[3], 16)
+        if len(resp) == 5 and resp[:3] == self.RESP_AC_ON:
+            return resp[3]
 
         return 0
 
-    @property
-    def fuel_tank_level(self) -> Optional[int]:
-        resp = self._split_hex(self.execute("012F"))
+    @staticmethod
+    def _decode_fuel_tank_level(data: dict[int, bytes]) -> Optional[int]:
+        resp = data.get(0x2F, b"")
 
-        if len(resp) == 3 and resp[0] == "41" and resp[1] == "2F":
-            a = int(resp[2], 16)
-            return int(a * 100 / 255)
+        if len(resp) == 1:
+            return int(resp[0] * 100 / 255)
 
         return None
 
+    @staticmethod
+    def _decode_rpm(data: dict[int, bytes]) -> int:
+        resp = data.get(0x0C, b"")
+
+        if len(resp) == 2:
+            return int(((resp[0] * 256) + resp[1]) / 4)
+
+        return 0
+
+    @property
+    def fuel_tank_level(self) -> Optional[int]:
+        return self._decode_fuel_tank_level(self.query_mode01(0x2F))
+
     @property
     def rpm(self) -> int:
-        resp = self._split_hex(self.execute("010C"))
+        return self._decode_rpm(self.query_mode01(0x0C))
 
-        if len(resp) == 4 and resp[0] == "41" and resp[1] == "0C":
-            a = int(resp[2], 16)
-            b = int(resp[3], 16)
-            return int(((a * 256) + b) / 4)
+    def rpm_and_fuel_tank_level(self) -> tuple[int, Optional[int]]:
+        # Both are mode 01 PIDs, so they can be fetched with a single request
+        data = self.query_mode01(0x0C, 0x2F)
 
-        return 0
+        return self._decode_rpm(data), self._decode_fuel_tank_level(data)
 
 
 class VanOBDDriver:
@@ -247,11 +373,12 @@ class VanOBDDriver:
                 self._obd_conn.detect_adapter()
                 return True
 
-            self._dbus_service["/Van0/RPM"] = self._obd_conn.rpm
+            rpm, fuel_tank_level = self._obd_conn.rpm_and_fuel_tank_level()
+
+            self._dbus_service["/Van0/RPM"] = rpm
             self._dbus_service["/Van0/AirConditionerOn"] = self._obd_conn.air_conditioner_on
             self._dbus_service["/Van0/AlternatorCurrent"] = self._obd_conn.alternator_current
 
-            fuel_tank_level = self._obd_conn.fuel_tank_level
             if fuel_tank_level is None:
                 self._dbus_tank_service["/Status"] = 1
             else: